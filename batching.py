@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Request Batching - pack compatible jobs into multi-output requests
+A 4-seed sweep on flux-dev becomes one num_outputs=4 request instead of four submits and polls
+"""
+
+import math
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+class BatchProvider:
+    """
+    A model endpoint for the batcher.
+
+    generate(prompt, width, height, seed, num_outputs) returns a list of outputs
+    (possibly shorter than num_outputs) or None on failure. max_outputs=1 means
+    the provider can't batch and jobs are sent as parallel single requests.
+    """
+
+    def __init__(self, name, generate, max_outputs=1):
+        self.name = name
+        self.generate = generate
+        self.max_outputs = max_outputs
+
+
+class Batcher:
+    """
+    Collects image jobs, packs compatible ones into multi-output requests, and
+    splits the outputs back to each caller's Future.
+
+    By default seeds are honoured exactly: jobs with the same model, prompt,
+    size and seed are sent as one single-output request and every caller gets
+    that same image, while unseeded jobs with the same model, prompt and size
+    are packed into one multi-output request. A seed sweep therefore goes out
+    as parallel single requests. Pass merge_seeds=True to pack seeded jobs too:
+    the request carries the first job's seed, and each Future's `seed` and
+    `output_index` attributes say which output of which seed it received.
+    """
+
+    def __init__(self, providers, max_workers=4, merge_seeds=False):
+        self.providers = {provider.name: provider for provider in providers}
+        self.merge_seeds = merge_seeds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._pending = []
+        self._lock = threading.Lock()
+        self._stats = {"images": 0, "requests": 0, "batched_requests": 0,
+                       "single_requests": 0, "shared_outputs": 0, "failed": 0}
+
+    def submit(self, model, prompt, width=1024, height=1024, seed=None):
+        """Queue a single-image job; the Future resolves to its output (None on failure)"""
+        if model not in self.providers:
+            raise ValueError(f"Unknown model: {model}")
+        future = Future()
+        with self._lock:
+            self._pending.append((model, prompt, width, height, seed, future))
+        return future
+
+    def flush(self):
+        """Send everything queued so far; returns once all requests are dispatched"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+
+        shared = {}
+        batchable = {}
+        for job in pending:
+            model, prompt, width, height, seed, _future = job
+            if seed is not None and not self.merge_seeds:
+                shared.setdefault((model, prompt, width, height, seed), []).append(job)
+            else:
+                batchable.setdefault((model, prompt, width, height), []).append(job)
+
+        for jobs in shared.values():
+            self._executor.submit(self._run_shared, jobs)
+
+        for (model, _prompt, _width, _height), jobs in batchable.items():
+            size = self.providers[model].max_outputs
+            for i in range(0, len(jobs), size):
+                chunk = jobs[i:i + size]
+                if len(chunk) == 1:
+                    self._executor.submit(self._run_shared, chunk)
+                else:
+                    self._executor.submit(self._run_batch, chunk)
+
+    def run(self, jobs):
+        """Submit (model, prompt, width, height, seed) tuples, flush and wait; returns outputs in order"""
+        futures = [self.submit(*job) for job in jobs]
+        self.flush()
+        return [future.result() for future in futures]
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self._stats[key] += n
+
+    def _call(self, model, prompt, width, height, seed, num_outputs):
+        self._count("requests")
+        try:
+            return self.providers[model].generate(prompt, width, height, seed, num_outputs)
+        except Exception as e:
+            print(f"❌ Exception from {model}: {e}")
+            return None
+
+    @staticmethod
+    def _resolve(future, output, seed, output_index):
+        future.seed = seed
+        future.output_index = output_index
+        future.set_result(output)
+
+    def _run_shared(self, jobs):
+        """One single-output request whose image goes to every (identical) job"""
+        model, prompt, width, height, seed, _future = jobs[0]
+        self._count("single_requests")
+        try:
+            outputs = self._call(model, prompt, width, height, seed, 1)
+            if outputs:
+                self._count("images", len(jobs))
+                self._count("shared_outputs", len(jobs) - 1)
+            else:
+                self._count("failed", len(jobs))
+            for job in jobs:
+                self._resolve(job[-1], outputs[0] if outputs else None, seed, 0)
+        finally:
+            for job in jobs:
+                if not job[-1].done():
+                    job[-1].set_result(None)
+
+    def _run_batch(self, chunk):
+        model, prompt, width, height, seed, _future = chunk[0]
+        self._count("batched_requests")
+        handed_off = set()
+        try:
+            outputs = self._call(model, prompt, width, height, seed, len(chunk)) or []
+
+            # Hand outputs back in submit order; anything the batch didn't cover
+            # falls back to parallel single requests
+            for index, (job, output) in enumerate(zip(chunk, outputs)):
+                self._count("images")
+                self._resolve(job[-1], output, seed, index)
+            leftovers = chunk[len(outputs):]
+            if leftovers:
+                print(f"↪️  Batch on {model} returned {len(outputs)}/{len(chunk)} outputs, "
+                      f"retrying {len(leftovers)} as single requests")
+            for job in leftovers:
+                try:
+                    self._executor.submit(self._run_shared, [job])
+                except RuntimeError:
+                    # Executor is shutting down; run it here rather than drop it
+                    self._run_shared([job])
+                handed_off.add(id(job))
+        finally:
+            # Never leave a caller waiting on a Future nobody will resolve
+            for job in chunk:
+                if id(job) not in handed_off and not job[-1].done():
+                    job[-1].set_result(None)
+
+    def stats(self):
+        """Request counts and requests per image (1.0 means no batching gain)"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["requests_per_image"] = stats["requests"] / stats["images"] if stats["images"] else None
+        return stats
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+def _comet_outputs(data):
+    """Output URLs from a CometAPI / Replicate get_result response"""
+    if not data:
+        return None
+    if "data" in data and "data" in data["data"]:
+        output = data["data"]["data"].get("output", [])
+    else:
+        output = data.get("output", [])
+    return output if isinstance(output, list) else [output]
+
+
+def cometapi_flux_dev_provider(max_outputs=4):
+    """flux-dev via the CometAPI Replicate endpoint (num_outputs)"""
+    from script_loader import load_script
+
+    def generate(prompt, width, height, seed, num_outputs):
+        comet = load_script("test-flux-api.py")
+        task_id = comet.generate_image(prompt, width=width, height=height,
+                                       seed=seed if seed is not None else 42,
+                                       num_outputs=num_outputs)
+        if not task_id:
+            return None
+        return _comet_outputs(comet.get_result(task_id))
+
+    return BatchProvider("flux-dev", generate, max_outputs=max_outputs)
+
+
+# Aspect ratios gemini-2.5-flash-image accepts (see gemini-image-cometapi-guide.md)
+GEMINI_ASPECT_RATIOS = ["1:1", "3:2", "2:3", "3:4", "4:3", "4:5", "5:4", "9:16", "16:9", "21:9"]
+
+
+def gemini_aspect_ratio(width, height):
+    """Nearest supported Gemini aspect ratio for a width x height request"""
+    target = math.log(width / height)
+
+    def distance(ratio):
+        w, h = (int(part) for part in ratio.split(":"))
+        return abs(math.log(w / h) - target)
+
+    return min(GEMINI_ASPECT_RATIOS, key=distance)
+
+
+def gemini_provider(max_outputs=4):
+    """Gemini text-to-image via CometAPI (candidateCount); outputs are saved file paths"""
+    from script_loader import load_script
+
+    def generate(prompt, width, height, seed, num_outputs):
+        gemini = load_script("test-gemini-image-api.py")
+        # Unique per request so concurrent batches never share (or overwrite) a file
+        output_file = f"gemini_batch_{uuid.uuid4().hex[:12]}.png"
+        result = gemini.generate_image_from_text(
+            prompt, aspect_ratio=gemini_aspect_ratio(width, height),
+            output_file=output_file, candidate_count=num_outputs)
+        if result is None:
+            return None
+        return result if isinstance(result, list) else [result]
+
+    return BatchProvider("gemini", generate, max_outputs=max_outputs)
+
+
+def bfl_flux2_pro_provider():
+    """FLUX.2 [pro] via the BFL Direct API - one image per request, so never batched"""
+    from script_loader import load_script
+    from progressive import image_url
+
+    def generate(prompt, width, height, seed, num_outputs):
+        bfl = load_script("test-flux2-bfl-api.py")
+        task_id, polling_url = bfl.generate_image_pro(prompt, width=width, height=height, seed=seed)
+        if not task_id or not polling_url:
+            return None
+        url = image_url(bfl.get_result(polling_url, task_id))
+        return [url] if url else None
+
+    return BatchProvider("flux-2-pro", generate, max_outputs=1)
+
+
+def mock_provider(name, max_outputs, latency=0.2, max_returned=None):
+    """Provider with a fixed per-request latency that returns fake image URLs"""
+    def generate(prompt, width, height, seed, num_outputs):
+        time.sleep(latency * random.uniform(0.9, 1.1))
+        count = min(num_outputs, max_returned or num_outputs)
+        return [f"https://example.invalid/{name}/{seed}-{i}.png" for i in range(count)]
+    return BatchProvider(name, generate, max_outputs=max_outputs)
+
+
+def main():
+    """Demo: 4-seed sweeps on batchable and non-batchable mock providers"""
+    print("=" * 70)
+    print("Request Batching Demo - mock providers")
+    print("=" * 70)
+
+    batcher = Batcher([
+        mock_provider("flux-dev", max_outputs=4),
+        mock_provider("gemini", max_outputs=4, max_returned=2),
+        mock_provider("flux-2-pro", max_outputs=1),
+    ], merge_seeds=True)
+
+    jobs = []
+    for model in ("flux-dev", "gemini", "flux-2-pro"):
+        for seed in range(4):
+            jobs.append((model, "a lighthouse at dusk, oil painting", 1024, 768, seed))
+
+    start = time.monotonic()
+    futures = [batcher.submit(*job) for job in jobs]
+    batcher.flush()
+    outputs = [future.result() for future in futures]
+    elapsed = time.monotonic() - start
+
+    for (model, _prompt, _w, _h, seed), future, output in zip(jobs, futures, outputs):
+        print(f"🖼️  {model:10} seed {seed} (seed {future.seed}, output {future.output_index}): {output}")
+
+    stats = batcher.stats()
+    batcher.shutdown()
+    print(f"\n📊 {stats['images']} images from {stats['requests']} requests "
+          f"({stats['batched_requests']} batched, {stats['single_requests']} single)")
+    print(f"📉 Requests per image: {stats['requests_per_image']:.2f}")
+    print(f"⏱️  Elapsed: {elapsed:.2f}s")
+
+    # Default mode honours seeds: duplicates share one request, sweeps go out singly
+    strict = Batcher([mock_provider("flux-dev", max_outputs=4)])
+    strict_jobs = [("flux-dev", "a red fox", 1024, 1024, seed) for seed in (7, 7, 7, 8)]
+    strict_outputs = strict.run(strict_jobs)
+    strict_stats = strict.stats()
+    strict.shutdown()
+    print(f"\n🎯 Seed-preserving mode: {strict_outputs}")
+    print(f"📊 {strict_stats['images']} images from {strict_stats['requests']} requests "
+          f"({strict_stats['shared_outputs']} shared)")
+
+    print("\n" + "=" * 70)
+    print("✅ Demo completed!")
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
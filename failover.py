@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Provider Failover - circuit breakers and health-scored routing
+Routes new jobs away from a degraded provider (api.bfl.ai / CometAPI) to an equivalent model
+"""
+
+import random
+import threading
+import time
+from collections import deque
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+class CircuitBreaker:
+    """
+    Per-endpoint breaker fed by error rate and latency.
+
+    Calls slower than latency_threshold count as failures. The breaker opens once
+    the failure rate over the last `window` calls reaches failure_threshold, stays
+    open for `cooldown` seconds, then lets `half_open_probes` calls through to
+    decide whether to close again. Only those probes can change the half-open
+    state: allow_request() hands out a ticket that must be passed back to
+    record(), so a call admitted earlier that finishes late can't close the
+    breaker on a probe's behalf.
+    """
+
+    def __init__(self, name, window=20, min_calls=5, failure_threshold=0.5,
+                 latency_threshold=60.0, cooldown=30.0, half_open_probes=1):
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_threshold = failure_threshold
+        self.latency_threshold = latency_threshold
+        self.cooldown = cooldown
+        self.half_open_probes = half_open_probes
+
+        self.state = CLOSED
+        self._calls = deque(maxlen=window)   # (ok, latency)
+        self._opened_at = None
+        self._probes_in_flight = 0
+        self._half_open_epoch = 0
+        self._lock = threading.Lock()
+
+    def _open(self, now):
+        self.state = OPEN
+        self._opened_at = now
+        self._probes_in_flight = 0
+        print(f"🔴 Circuit opened: {self.name}")
+
+    def _refresh_state(self):
+        if self.state == OPEN and time.monotonic() - self._opened_at >= self.cooldown:
+            self.state = HALF_OPEN
+            self._probes_in_flight = 0
+            self._half_open_epoch += 1
+            print(f"🟡 Circuit half-open, probing: {self.name}")
+
+    def allow_request(self):
+        """
+        Return a ticket if a call may go to this endpoint right now, else None.
+
+        Pass the ticket back to record() with the call's outcome.
+        """
+        with self._lock:
+            self._refresh_state()
+            if self.state == CLOSED:
+                return ("call", None)
+            if self.state == HALF_OPEN and self._probes_in_flight < self.half_open_probes:
+                self._probes_in_flight += 1
+                return ("probe", self._half_open_epoch)
+            return None
+
+    def record(self, ok, latency, ticket=None):
+        """Feed the outcome of a call (and the ticket it was admitted with) back into the breaker"""
+        ok = ok and latency <= self.latency_threshold
+        with self._lock:
+            now = time.monotonic()
+            if self.state == HALF_OPEN:
+                if ticket != ("probe", self._half_open_epoch):
+                    # Not this round's probe: keep the sample but leave the decision to the probe
+                    self._calls.append((ok, latency))
+                    return
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                if ok:
+                    self.state = CLOSED
+                    self._calls.clear()
+                    print(f"🟢 Circuit closed: {self.name}")
+                else:
+                    self._open(now)
+                self._calls.append((ok, latency))
+                return
+
+            self._calls.append((ok, latency))
+            if self.state == CLOSED and len(self._calls) >= self.min_calls:
+                failures = sum(1 for call_ok, _ in self._calls if not call_ok)
+                if failures / len(self._calls) >= self.failure_threshold:
+                    self._open(now)
+
+    def health_score(self):
+        """0.0 (unusable) to 1.0 (healthy) from success rate and mean latency"""
+        with self._lock:
+            self._refresh_state()
+            if self.state == OPEN:
+                return 0.0
+            if not self._calls:
+                score = 1.0
+            else:
+                success_rate = sum(1 for ok, _ in self._calls if ok) / len(self._calls)
+                mean_latency = sum(latency for _, latency in self._calls) / len(self._calls)
+                score = success_rate / (1.0 + mean_latency / self.latency_threshold)
+            if self.state == HALF_OPEN:
+                score *= 0.5
+            return score
+
+
+class Endpoint:
+    """
+    A provider endpoint: call(prompt, width, height, seed) returns a result or None.
+
+    weight expresses a static preference between equivalent endpoints and is
+    multiplied by the breaker's health score when routing.
+    """
+
+    def __init__(self, name, call, breaker=None, weight=1.0):
+        self.name = name
+        self.call = call
+        self.breaker = breaker or CircuitBreaker(name)
+        self.weight = weight
+
+
+class FailoverRouter:
+    """
+    Sends each job to an endpoint chosen at random in proportion to
+    weight * health score, failing over to the others on error. Degraded
+    endpoints keep a small share of traffic so their breakers see enough calls
+    to open, and half-open endpoints get probed as they recover.
+    """
+
+    def __init__(self, endpoints):
+        self.endpoints = list(endpoints)
+
+    def health(self):
+        return {ep.name: {"state": ep.breaker.state, "score": round(ep.breaker.health_score(), 3)}
+                for ep in self.endpoints}
+
+    # Floor for endpoints whose breaker is still closed or half-open, so one that
+    # scored 0 keeps getting the odd call and can open or recover
+    MIN_SHARE = 0.05
+
+    def _routing_key(self, endpoint):
+        # Weighted random ordering (Efraimidis-Spirakis): u ** (1 / w)
+        if endpoint.breaker.state == OPEN and endpoint.breaker.health_score() == 0:
+            return -1.0
+        share = max(endpoint.weight * endpoint.breaker.health_score(), self.MIN_SHARE)
+        return random.random() ** (1.0 / share)
+
+    def generate(self, prompt, width=1024, height=1024, seed=None):
+        """Run the job on the best available endpoint; returns (endpoint_name, result)"""
+        ranked = sorted(self.endpoints, key=self._routing_key, reverse=True)
+
+        for endpoint in ranked:
+            ticket = endpoint.breaker.allow_request()
+            if ticket is None:
+                continue
+
+            start = time.monotonic()
+            try:
+                result = endpoint.call(prompt, width=width, height=height, seed=seed)
+            except Exception as e:
+                print(f"❌ Exception from {endpoint.name}: {e}")
+                result = None
+            endpoint.breaker.record(result is not None, time.monotonic() - start, ticket)
+
+            if result is not None:
+                return endpoint.name, result
+            print(f"↪️  {endpoint.name} failed, trying next provider")
+
+        print(f"❌ No healthy provider available")
+        return None, None
+
+
+def bfl_flux2_pro(prompt, width=1024, height=1024, seed=None):
+    """FLUX.2 [pro] via the BFL Direct API (test-flux2-bfl-api.py)"""
+    from script_loader import load_script
+    bfl = load_script("test-flux2-bfl-api.py")
+    task_id, polling_url = bfl.generate_image_pro(prompt, width=width, height=height, seed=seed)
+    if not task_id or not polling_url:
+        return None
+    return bfl.get_result(polling_url, task_id)
+
+
+def cometapi_flux_dev(prompt, width=1024, height=1024, seed=None):
+    """flux-dev via the CometAPI Replicate endpoint (test-flux-api.py)"""
+    from script_loader import load_script
+    comet = load_script("test-flux-api.py")
+    task_id = comet.generate_image(prompt, width=width, height=height,
+                                   seed=seed if seed is not None else 42)
+    if not task_id:
+        return None
+    return comet.get_result(task_id)
+
+
+def build_flux_router(**breaker_options):
+    """Router over the equivalent FLUX models on BFL and CometAPI"""
+    return FailoverRouter([
+        Endpoint("bfl/flux-2-pro", bfl_flux2_pro,
+                 CircuitBreaker("bfl/flux-2-pro", **breaker_options), weight=4.0),
+        Endpoint("cometapi/flux-dev", cometapi_flux_dev,
+                 CircuitBreaker("cometapi/flux-dev", **breaker_options)),
+    ])
+
+
+def mock_endpoint(name, state):
+    """Endpoint whose error rate and latency are read from a shared dict"""
+    def call(prompt, width=1024, height=1024, seed=None):
+        time.sleep(state["latency"])
+        if random.random() < state["error_rate"]:
+            return None
+        return {"status": "Ready", "result": {"sample": f"https://example.invalid/{name}.png"}}
+    return call
+
+
+def main():
+    """Demo: BFL degrades mid-run, traffic shifts to CometAPI, then recovers"""
+    print("=" * 70)
+    print("Provider Failover Demo - mock providers")
+    print("=" * 70)
+
+    bfl_state = {"latency": 0.01, "error_rate": 0.0}
+    comet_state = {"latency": 0.02, "error_rate": 0.0}
+    options = {"window": 10, "min_calls": 4, "latency_threshold": 0.5, "cooldown": 0.5}
+    router = FailoverRouter([
+        Endpoint("bfl/flux-2-pro", mock_endpoint("bfl", bfl_state),
+                 CircuitBreaker("bfl/flux-2-pro", **options), weight=4.0),
+        Endpoint("cometapi/flux-dev", mock_endpoint("comet", comet_state),
+                 CircuitBreaker("cometapi/flux-dev", **options)),
+    ])
+
+    phases = [
+        ("Both healthy", 0.0),
+        ("BFL outage", 0.9),
+        ("BFL recovered", 0.0),
+    ]
+    for label, bfl_errors in phases:
+        bfl_state["error_rate"] = bfl_errors
+        served = {}
+        for i in range(20):
+            name, _ = router.generate(f"prompt {i}", seed=i)
+            served[name] = served.get(name, 0) + 1
+            time.sleep(0.05)
+        print(f"\n📊 {label}: served by {served}")
+        print(f"🩺 Health: {router.health()}\n")
+
+    print("=" * 70)
+    print("✅ Demo completed!")
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Progressive Generation - draft-then-refine with FLUX.2
+Submits a fast draft alongside the full-quality [flex] job so users see something right away
+"""
+
+import os
+import random
+import threading
+import time
+
+from scheduler import INTERACTIVE
+
+
+def image_url(data):
+    """Extract the image URL from a BFL get_result response"""
+    if not data:
+        return None
+    result = data.get("result", {}) or {}
+    if "sample" in result:
+        return result.get("sample")
+    images = result.get("images", [])
+    if images:
+        return images[0].get("url")
+    return None
+
+
+class ProgressiveGeneration:
+    """Handle for a draft + final generation pair"""
+
+    def __init__(self, prompt, seed):
+        self.prompt = prompt
+        self.seed = seed
+        self.started_at = time.monotonic()
+        self.draft = None
+        self.final = None
+        self.time_to_first_image = None
+        self.time_to_final_image = None
+        self._lock = threading.Lock()
+        self._first = threading.Event()
+        self._final_done = threading.Event()
+
+    @property
+    def current(self):
+        """Best image available so far - the final once ready, otherwise the draft"""
+        return self.final or self.draft
+
+    def wait_first(self, timeout=None):
+        """Block until any image (draft or final) is available"""
+        self._first.wait(timeout)
+        return self.current
+
+    def wait_final(self, timeout=None):
+        """Block until the full-quality job has finished (None on failure)"""
+        self._final_done.wait(timeout)
+        return self.final
+
+    def _record(self, stage, data):
+        with self._lock:
+            now = time.monotonic() - self.started_at
+            if stage == "draft":
+                # A draft that lands after the final image is no longer useful
+                if self.final is not None:
+                    return False
+                self.draft = data
+            else:
+                self.final = data
+                self.time_to_final_image = now
+            if data is not None and self.time_to_first_image is None:
+                self.time_to_first_image = now
+                self._first.set()
+            if stage == "final":
+                # Unblock wait_first() even if neither job produced an image
+                self._first.set()
+                self._final_done.set()
+            return True
+
+
+def generate_progressive(prompt, width=1024, height=1024, steps=50, guidance=4.5, seed=None,
+                         draft_model="pro", draft_steps=6, backend=None, scheduler=None,
+                         client="default", on_draft=None, on_final=None):
+    """
+    Start a draft and a full-quality [flex] generation with the same prompt and seed.
+
+    draft_model is "pro" (FLUX.2 [pro]) or "flex" (FLUX.2 [flex] with draft_steps).
+    backend defaults to test-flux2-bfl-api.py. When a scheduler is given, both
+    jobs are submitted as INTERACTIVE. Returns a ProgressiveGeneration immediately;
+    on_draft / on_final are called with the get_result data as each one lands.
+    """
+    if backend is None:
+        from script_loader import load_script
+        backend = load_script("test-flux2-bfl-api.py")
+
+    if draft_model not in ("pro", "flex"):
+        raise ValueError(f"Unknown draft model: {draft_model}")
+
+    if seed is None:
+        seed = random.randint(0, 2**31 - 1)
+
+    generation = ProgressiveGeneration(prompt, seed)
+
+    def fetch_draft():
+        if draft_model == "pro":
+            task_id, polling_url = backend.generate_image_pro(prompt, width=width, height=height, seed=seed)
+        else:
+            task_id, polling_url = backend.generate_image_flex(
+                prompt, width=width, height=height, steps=draft_steps, guidance=guidance, seed=seed)
+        if task_id and polling_url:
+            return backend.get_result(polling_url, task_id, poll_interval=1)
+        return None
+
+    def fetch_final():
+        task_id, polling_url = backend.generate_image_flex(
+            prompt, width=width, height=height, steps=steps, guidance=guidance, seed=seed)
+        if task_id and polling_url:
+            return backend.get_result(polling_url, task_id)
+        return None
+
+    # Always record the outcome, even if the backend raises, so wait_first()
+    # and wait_final() can't block forever
+    def run_draft():
+        data = None
+        try:
+            data = fetch_draft()
+        except Exception as e:
+            print(f"❌ Draft generation failed: {e}")
+        finally:
+            show = generation._record("draft", data)
+        if show and data is not None and on_draft:
+            on_draft(data)
+        return data
+
+    def run_final():
+        data = None
+        try:
+            data = fetch_final()
+        except Exception as e:
+            print(f"❌ Final generation failed: {e}")
+        finally:
+            generation._record("final", data)
+        if data is not None and on_final:
+            on_final(data)
+        return data
+
+    # Draft goes first so a tight provider limit doesn't queue it behind the final
+    if scheduler is not None:
+        scheduler.submit(run_draft, client=client, priority=INTERACTIVE, provider="bfl")
+        scheduler.submit(run_final, client=client, priority=INTERACTIVE, provider="bfl")
+    else:
+        threading.Thread(target=run_draft, daemon=True).start()
+        threading.Thread(target=run_final, daemon=True).start()
+
+    return generation
+
+
+class MockFlux2Backend:
+    """Offline stand-in for test-flux2-bfl-api.py with step-proportional latency"""
+
+    def __init__(self, seconds_per_step=0.02, pro_seconds=0.15):
+        self.seconds_per_step = seconds_per_step
+        self.pro_seconds = pro_seconds
+        self._tasks = {}
+        self._lock = threading.Lock()
+
+    def _create(self, model, duration, seed):
+        with self._lock:
+            task_id = f"mock-{model}-{len(self._tasks) + 1}"
+            self._tasks[task_id] = (time.monotonic() + duration, model, seed)
+        return task_id, f"mock://get_result?id={task_id}"
+
+    def generate_image_pro(self, prompt, width=1024, height=1024, seed=None):
+        return self._create("pro", self.pro_seconds, seed)
+
+    def generate_image_flex(self, prompt, width=1024, height=1024, steps=50, guidance=4.5, seed=None):
+        return self._create(f"flex-{steps}", steps * self.seconds_per_step, seed)
+
+    def get_result(self, polling_url, task_id, max_attempts=60, poll_interval=2):
+        ready_at, model, seed = self._tasks[task_id]
+        time.sleep(max(0.0, ready_at - time.monotonic()))
+        return {
+            "id": task_id,
+            "status": "Ready",
+            "result": {"sample": f"https://example.invalid/{model}/{seed}.png"},
+        }
+
+
+def main():
+    """Main execution"""
+    print("=" * 70)
+    print("FLUX.2 Progressive Generation - draft then refine")
+    print("=" * 70)
+
+    if os.getenv("BFL_API_KEY"):
+        backend = None
+        print("🌐 Using BFL Direct API")
+    else:
+        backend = MockFlux2Backend()
+        print("🧪 BFL_API_KEY not set - using mock backend")
+
+    prompt = "a beautiful sunset over mountains, photorealistic, 85mm lens"
+    generation = generate_progressive(
+        prompt,
+        width=1024,
+        height=768,
+        seed=42,
+        backend=backend,
+        on_draft=lambda data: print(f"⚡ Draft ready: {image_url(data)}"),
+        on_final=lambda data: print(f"🖼️  Final ready: {image_url(data)}"),
+    )
+
+    generation.wait_final()
+
+    print("\n" + "=" * 70)
+    if generation.final:
+        print(f"⏱️  Time to first image: {generation.time_to_first_image:.2f}s")
+        print(f"⏱️  Time to final image: {generation.time_to_final_image:.2f}s")
+        print("✅ Progressive generation completed!")
+    else:
+        print("❌ Final generation failed")
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
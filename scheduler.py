@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Job Scheduler - priority classes, deadlines and per-client fairness
+Sits in front of the submit path so interactive requests don't queue behind bulk batches
+"""
+
+import heapq
+import itertools
+import threading
+import time
+import random
+
+# Priority classes - lower value is dispatched first
+INTERACTIVE = 0
+NORMAL = 1
+BULK = 2
+
+PRIORITY_NAMES = {INTERACTIVE: "interactive", NORMAL: "normal", BULK: "bulk"}
+
+
+class Job:
+    """A unit of work submitted to the scheduler"""
+
+    def __init__(self, job_id, fn, args, kwargs, client, priority, provider, deadline, cost):
+        self.job_id = job_id
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.client = client
+        self.priority = priority
+        self.provider = provider
+        self.deadline = deadline
+        self.cost = cost
+        self.finish_tag = 0.0
+        self.submitted_at = time.monotonic()
+        self.started_at = None
+        self.finished_at = None
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self._done = threading.Event()
+
+    @property
+    def wait_time(self):
+        """Seconds spent queued before dispatch"""
+        if self.started_at is None:
+            return None
+        return self.started_at - self.submitted_at
+
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """Block until the job finishes and return its result (None on failure/expiry)"""
+        self._done.wait(timeout)
+        return self.result
+
+
+class JobScheduler:
+    """
+    Dispatches jobs to a pool of worker threads.
+
+    Ordering: strict priority classes first; within a class, jobs whose deadline
+    is within `urgent_window` seconds go earliest-deadline-first, everything else
+    uses weighted fair queuing (self-clocked finish tags) across clients. Each
+    client's queue keeps its deadline jobs ahead of its undated ones, so a tight
+    deadline isn't stuck behind that client's own backlog. Jobs are
+    only dispatched while their provider is under its concurrency limit, and jobs
+    whose deadline has already passed are expired instead of run.
+    """
+
+    def __init__(self, max_workers=8, provider_limits=None, client_weights=None,
+                 urgent_window=5.0, metrics_window=1000):
+        self.max_workers = max_workers
+        self.provider_limits = dict(provider_limits or {})
+        self.client_weights = dict(client_weights or {})
+        self.urgent_window = urgent_window
+
+        self._cond = threading.Condition()
+        self._queues = {}          # (priority, client, provider) -> heap of (deadline, job_id, job)
+        self._client_tags = {}     # (priority, client) -> last assigned finish tag
+        self._virtual_time = 0.0
+        self._in_flight = {}       # provider -> running job count
+        self._ids = itertools.count(1)
+        self._depth = 0
+        self._wait_times = {p: [] for p in PRIORITY_NAMES}
+        self._metrics_window = metrics_window
+        self._counters = {"submitted": 0, "completed": 0, "failed": 0, "expired": 0}
+        self._shutdown = False
+
+        self._workers = []
+        for i in range(max_workers):
+            worker = threading.Thread(target=self._worker_loop, name=f"scheduler-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def set_client_weight(self, client, weight):
+        """Give a client a larger (or smaller) share of dispatch slots"""
+        with self._cond:
+            self.client_weights[client] = weight
+
+    def submit(self, fn, *args, client="default", priority=NORMAL, provider="default",
+               deadline=None, cost=1.0, **kwargs):
+        """
+        Queue fn(*args, **kwargs) and return a Job handle.
+
+        deadline is a relative timeout in seconds; a job that can't start before
+        it passes is expired with result None.
+        """
+        if priority not in PRIORITY_NAMES:
+            raise ValueError(f"Unknown priority class: {priority}")
+
+        absolute_deadline = time.monotonic() + deadline if deadline is not None else None
+        job = Job(next(self._ids), fn, args, kwargs, client, priority, provider,
+                  absolute_deadline, cost)
+
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("Scheduler has been shut down")
+            weight = self.client_weights.get(client, 1.0)
+            # Tags are per priority class so a client's bulk backlog doesn't
+            # push back its own interactive jobs
+            tag_key = (priority, client)
+            start_tag = max(self._virtual_time, self._client_tags.get(tag_key, 0.0))
+            job.finish_tag = start_tag + cost / weight
+            self._client_tags[tag_key] = job.finish_tag
+            deadline_key = absolute_deadline if absolute_deadline is not None else float("inf")
+            heapq.heappush(self._queues.setdefault((priority, client, provider), []),
+                           (deadline_key, job.job_id, job))
+            self._depth += 1
+            self._counters["submitted"] += 1
+            self._cond.notify()
+
+        return job
+
+    def _provider_available(self, provider):
+        limit = self.provider_limits.get(provider)
+        return limit is None or self._in_flight.get(provider, 0) < limit
+
+    def _expire_heads(self, now):
+        """Drop queued jobs whose deadline has already passed"""
+        for key in list(self._queues):
+            queue = self._queues[key]
+            # Heaps are ordered by deadline, so expired jobs are always at the front
+            while queue and queue[0][0] <= now:
+                job = heapq.heappop(queue)[2]
+                self._depth -= 1
+                self._counters["expired"] += 1
+                job.status = "expired"
+                job.finished_at = now
+                job._done.set()
+            if not queue:
+                del self._queues[key]
+
+    def _next_job(self):
+        """Pick the best dispatchable queue head, or None"""
+        now = time.monotonic()
+        self._expire_heads(now)
+
+        best_key = None
+        best_rank = None
+        for key, queue in self._queues.items():
+            head = queue[0][2]
+            if not self._provider_available(head.provider):
+                continue
+            urgent = head.deadline is not None and head.deadline - now <= self.urgent_window
+            if urgent:
+                rank = (head.priority, 0, head.deadline, head.job_id)
+            else:
+                rank = (head.priority, 1, head.finish_tag, head.job_id)
+            if best_rank is None or rank < best_rank:
+                best_key, best_rank = key, rank
+
+        if best_key is None:
+            return None
+
+        queue = self._queues[best_key]
+        job = heapq.heappop(queue)[2]
+        if not queue:
+            del self._queues[best_key]
+        self._depth -= 1
+        self._virtual_time = max(self._virtual_time, job.finish_tag)
+        return job
+
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                while True:
+                    job = self._next_job()
+                    if job:
+                        break
+                    if self._shutdown and not self._queues:
+                        return
+                    # Wake up periodically so queued deadlines still get expired
+                    self._cond.wait(timeout=0.5)
+
+                self._in_flight[job.provider] = self._in_flight.get(job.provider, 0) + 1
+                job.started_at = time.monotonic()
+                job.status = "running"
+                waits = self._wait_times[job.priority]
+                waits.append(job.wait_time)
+                if len(waits) > self._metrics_window:
+                    del waits[0]
+
+            try:
+                job.result = job.fn(*job.args, **job.kwargs)
+                job.status = "completed"
+            except (Exception, SystemExit) as e:
+                # SystemExit too: a script bailing out must fail the job, not
+                # kill the worker thread
+                print(f"❌ Job {job.job_id} ({job.client}) raised: {e!r}")
+                job.error = e
+                job.status = "failed"
+            finally:
+                # Always give the provider slot back and wake waiters, even if
+                # something nastier (e.g. KeyboardInterrupt) is propagating
+                if job.status == "running":
+                    job.status = "failed"
+                with self._cond:
+                    self._in_flight[job.provider] -= 1
+                    self._counters[job.status] += 1
+                    job.finished_at = time.monotonic()
+                    job._done.set()
+                    self._cond.notify_all()
+
+    def metrics(self):
+        """Snapshot of queue depth, in-flight counts and wait-time stats per priority"""
+        with self._cond:
+            depth_by_priority = {name: 0 for name in PRIORITY_NAMES.values()}
+            depth_by_client = {}
+            for (priority, client, _provider), queue in self._queues.items():
+                depth_by_priority[PRIORITY_NAMES[priority]] += len(queue)
+                depth_by_client[client] = depth_by_client.get(client, 0) + len(queue)
+
+            wait_stats = {}
+            for priority, waits in self._wait_times.items():
+                if not waits:
+                    continue
+                ordered = sorted(waits)
+                wait_stats[PRIORITY_NAMES[priority]] = {
+                    "count": len(ordered),
+                    "mean": sum(ordered) / len(ordered),
+                    "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+                    "max": ordered[-1],
+                }
+
+            return {
+                "queue_depth": self._depth,
+                "queue_depth_by_priority": depth_by_priority,
+                "queue_depth_by_client": depth_by_client,
+                "in_flight": {p: n for p, n in self._in_flight.items() if n},
+                "wait_time": wait_stats,
+                **self._counters,
+            }
+
+    def shutdown(self, wait=True):
+        """Stop accepting jobs; workers exit once the queue has drained"""
+        with self._cond:
+            self._shutdown = True
+            self._cond.notify_all()
+        if wait:
+            for worker in self._workers:
+                worker.join()
+
+
+def mock_generate(prompt, duration=0.05):
+    """Stand-in for a submit+poll round trip"""
+    time.sleep(duration * random.uniform(0.8, 1.2))
+    return {"prompt": prompt, "status": "Ready"}
+
+
+def print_metrics(metrics):
+    print(f"📊 Queue depth: {metrics['queue_depth']} {metrics['queue_depth_by_priority']}")
+    print(f"✅ Completed: {metrics['completed']}  ❌ Failed: {metrics['failed']}  ⏰ Expired: {metrics['expired']}")
+    for name, stats in metrics["wait_time"].items():
+        print(f"⏱️  {name:12} wait - mean {stats['mean']:.3f}s, p95 {stats['p95']:.3f}s, "
+              f"max {stats['max']:.3f}s ({stats['count']} jobs)")
+
+
+def main():
+    """Demo: a bulk batch flood alongside interactive single-image requests"""
+    print("=" * 70)
+    print("Job Scheduler Demo - mock provider")
+    print("=" * 70)
+
+    scheduler = JobScheduler(max_workers=8, provider_limits={"bfl": 4, "cometapi": 4},
+                             client_weights={"batch-client": 1.0, "team-a": 2.0})
+
+    # A client floods the system with a bulk batch
+    bulk_jobs = [
+        scheduler.submit(mock_generate, f"bulk prompt {i}", client="batch-client",
+                         priority=BULK, provider="bfl")
+        for i in range(300)
+    ]
+
+    # Meanwhile other clients send interactive and normal requests
+    interactive_jobs = []
+    for i in range(10):
+        time.sleep(0.1)
+        interactive_jobs.append(scheduler.submit(
+            mock_generate, f"interactive prompt {i}", client=f"user-{i}",
+            priority=INTERACTIVE, provider="bfl", deadline=10))
+        scheduler.submit(mock_generate, f"team prompt {i}", client="team-a",
+                         priority=NORMAL, provider="cometapi")
+
+    for job in interactive_jobs:
+        job.wait()
+    print("\n⚡ Interactive jobs done while bulk batch still queued:")
+    print_metrics(scheduler.metrics())
+
+    for job in bulk_jobs:
+        job.wait()
+    print("\n📦 Bulk batch drained:")
+    print_metrics(scheduler.metrics())
+
+    scheduler.shutdown()
+    print("\n" + "=" * 70)
+    print("✅ Demo completed!")
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
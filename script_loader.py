@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Script Loader - import the hyphenated test-*.py scripts as modules
+"""
+
+import importlib.util
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+
+_loaded = {}
+
+
+class ScriptUnavailable(RuntimeError):
+    """A script could not be imported, e.g. its config.py or API key is missing"""
+
+
+def load_script(filename):
+    """Import a script such as 'test-flux2-bfl-api.py' and return the module (cached)
+
+    The scripts sys.exit() when their credentials are missing; that is raised as
+    ScriptUnavailable instead so callers can treat the provider as failed.
+    """
+    if filename in _loaded:
+        return _loaded[filename]
+
+    path = SCRIPT_DIR / filename
+    module_name = path.stem.replace("-", "_")
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(spec)
+    try:
+        spec.loader.exec_module(module)
+    except SystemExit:
+        raise ScriptUnavailable(f"{filename} exited during import (missing config or API key?)") from None
+
+    _loaded[filename] = module
+    return module
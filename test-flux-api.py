@@ -17,8 +17,8 @@ except ImportError:
     print("Please copy config.example.py to config.py and add your API key")
     sys.exit(1)
 
-def generate_image(prompt, width=1024, height=768, seed=42):
-    """Generate an image using Flux API via Replicate endpoint"""
+def generate_image(prompt, width=1024, height=768, seed=42, num_outputs=1):
+    """Generate one or more images using Flux API via Replicate endpoint"""
     # Use Replicate-compatible endpoint which works with CometAPI
     url = f"{BASE_URL}/replicate/v1/models/black-forest-labs/{MODEL}/predictions"
     
@@ -32,12 +32,14 @@ def generate_image(prompt, width=1024, height=768, seed=42):
             "prompt": prompt,
             "width": width,
             "height": height,
-            "num_outputs": 1,
+            "num_outputs": num_outputs,
             "seed": seed
         }
     }
     
     print(f"🚀 Generating image with prompt: '{prompt}'")
+    if num_outputs > 1:
+        print(f"🔢 Outputs: {num_outputs}")
     print(f"📍 URL: {url}")
     
     try:
@@ -18,8 +18,11 @@ except ImportError:
     print("Please copy config.example.py to config.py and add your API key")
     sys.exit(1)
 
-def generate_image_from_text(prompt, aspect_ratio="1:1", output_file="output.png"):
-    """Generate an image from text prompt using Gemini"""
+def generate_image_from_text(prompt, aspect_ratio="1:1", output_file="output.png", candidate_count=1):
+    """Generate an image from text prompt using Gemini
+
+    With candidate_count > 1, returns a list of saved paths (one per candidate)
+    """
     url = f"{BASE_URL}/v1beta/models/{MODEL}:generateContent"
     
     headers = {
@@ -43,9 +46,14 @@ def generate_image_from_text(prompt, aspect_ratio="1:1", output_file="output.png
         }
     }
     
+    if candidate_count > 1:
+        payload["generationConfig"]["candidateCount"] = candidate_count
+    
     print(f"🚀 Generating image from text prompt")
     print(f"📝 Prompt: '{prompt}'")
     print(f"📐 Aspect Ratio: {aspect_ratio}")
+    if candidate_count > 1:
+        print(f"🔢 Candidates: {candidate_count}")
     print(f"📍 URL: {url}")
     
     try:
@@ -58,36 +66,44 @@ def generate_image_from_text(prompt, aspect_ratio="1:1", output_file="output.png
             # Extract image from response
             candidates = data.get("candidates", [])
             if candidates:
-                parts = candidates[0].get("content", {}).get("parts", [])
-                
-                for part in parts:
-                    if "inlineData" in part or "inline_data" in part:
-                        inline_data = part.get("inlineData") or part.get("inline_data")
-                        mime_type = inline_data.get("mimeType") or inline_data.get("mime_type")
-                        image_data = inline_data.get("data")
-                        
-                        if image_data:
-                            # Decode and save image
-                            image_bytes = base64.b64decode(image_data)
+                saved = []
+                for index, candidate in enumerate(candidates[:candidate_count]):
+                    parts = candidate.get("content", {}).get("parts", [])
+                    
+                    for part in parts:
+                        if "inlineData" in part or "inline_data" in part:
+                            inline_data = part.get("inlineData") or part.get("inline_data")
+                            mime_type = inline_data.get("mimeType") or inline_data.get("mime_type")
+                            image_data = inline_data.get("data")
                             
-                            # Determine file extension from mime type
-                            ext_map = {
-                                "image/png": ".png",
-                                "image/jpeg": ".jpg",
-                                "image/jpg": ".jpg",
-                                "image/webp": ".webp"
-                            }
-                            ext = ext_map.get(mime_type, ".png")
-                            output_path = Path(output_file).with_suffix(ext)
-                            
-                            with open(output_path, "wb") as f:
-                                f.write(image_bytes)
-                            
-                            print(f"✅ Image generated successfully!")
-                            print(f"💾 Saved to: {output_path}")
-                            print(f"📦 Size: {len(image_bytes)} bytes")
-                            print(f"🎨 MIME Type: {mime_type}")
-                            return str(output_path)
+                            if image_data:
+                                # Decode and save image
+                                image_bytes = base64.b64decode(image_data)
+                                
+                                # Determine file extension from mime type
+                                ext_map = {
+                                    "image/png": ".png",
+                                    "image/jpeg": ".jpg",
+                                    "image/jpg": ".jpg",
+                                    "image/webp": ".webp"
+                                }
+                                ext = ext_map.get(mime_type, ".png")
+                                output_path = Path(output_file).with_suffix(ext)
+                                if index > 0:
+                                    output_path = output_path.with_stem(f"{output_path.stem}_{index + 1}")
+                                
+                                with open(output_path, "wb") as f:
+                                    f.write(image_bytes)
+                                
+                                print(f"✅ Image generated successfully!")
+                                print(f"💾 Saved to: {output_path}")
+                                print(f"📦 Size: {len(image_bytes)} bytes")
+                                print(f"🎨 MIME Type: {mime_type}")
+                                saved.append(str(output_path))
+                                break
+                
+                if saved:
+                    return saved[0] if candidate_count == 1 else saved
                 
                 print("❌ No image data found in response")
                 print(f"Response: {json.dumps(data, indent=2)[:500]}")
@@ -0,0 +1,501 @@
+#!/usr/bin/env python3
+"""
+Worker Mode - many processes (or machines) pulling jobs from a shared queue
+Jobs are leased with a visibility timeout so a crashed worker's jobs get picked up again
+"""
+
+import argparse
+import contextlib
+import functools
+import importlib
+import json
+import multiprocessing
+import os
+import random
+import socket
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+
+
+class Broker(ABC):
+    """
+    Interface for a shared job queue + result store.
+
+    SQLiteBroker covers processes on a single host (it runs in WAL mode, which
+    needs shared memory, so keep the file off network filesystems); implement
+    the same methods on top of Redis, Postgres, SQS, etc. to spread workers over
+    several nodes. Workers take a factory returning a Broker, since each process
+    and thread opens its own connection.
+    """
+
+    @abstractmethod
+    def enqueue(self, kind, payload, max_attempts=3):
+        """Add a job; returns its id"""
+
+    def enqueue_many(self, jobs, max_attempts=3):
+        """Add (kind, payload) pairs; returns their ids. Override to do it in one round trip"""
+        return [self.enqueue(kind, payload, max_attempts) for kind, payload in jobs]
+
+    @abstractmethod
+    def lease(self, worker_id, lease_seconds):
+        """Claim the next visible job; returns (job_id, kind, payload, attempt) or None"""
+
+    @abstractmethod
+    def extend(self, job_id, worker_id, lease_seconds):
+        """Push a held lease further out; returns False if the lease was lost"""
+
+    @abstractmethod
+    def complete(self, job_id, worker_id, result):
+        """Store the result of a leased job"""
+
+    @abstractmethod
+    def fail(self, job_id, worker_id, error):
+        """Requeue a leased job, or mark it failed once it is out of attempts"""
+
+    @abstractmethod
+    def result(self, job_id):
+        """Return {"status", "result", "error", "worker"} for a job, or None"""
+
+    @abstractmethod
+    def stats(self):
+        """Queue counts for reporting"""
+
+    @abstractmethod
+    def close(self):
+        """Release the connection"""
+
+
+class SQLiteBroker(Broker):
+    """File-backed queue for one host; each process/thread should open its own instance"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            max_attempts INTEGER NOT NULL DEFAULT 3,
+            leased_by TEXT,
+            lease_expires REAL,
+            result TEXT,
+            error TEXT,
+            created_at REAL NOT NULL,
+            finished_at REAL
+        );
+        CREATE INDEX IF NOT EXISTS jobs_visible ON jobs (status, lease_expires, id);
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+
+    def enqueue(self, kind, payload, max_attempts=3):
+        cursor = self._conn.execute(
+            "INSERT INTO jobs (kind, payload, max_attempts, created_at) VALUES (?, ?, ?, ?)",
+            (kind, json.dumps(payload), max_attempts, time.time()))
+        return cursor.lastrowid
+
+    def enqueue_many(self, jobs, max_attempts=3):
+        """Insert (kind, payload) pairs in one transaction; returns their ids"""
+        now = time.time()
+        job_ids = []
+        with self._transaction():
+            for kind, payload in jobs:
+                cursor = self._conn.execute(
+                    "INSERT INTO jobs (kind, payload, max_attempts, created_at) VALUES (?, ?, ?, ?)",
+                    (kind, json.dumps(payload), max_attempts, now))
+                job_ids.append(cursor.lastrowid)
+        return job_ids
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        # IMMEDIATE takes the write lock up front so two workers can't lease the same row
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def lease(self, worker_id, lease_seconds):
+        now = time.time()
+        with self._transaction():
+            # Leases that ran out on their last attempt are given up on
+            self._conn.execute(
+                "UPDATE jobs SET status = 'failed', error = 'lease expired', finished_at = ? "
+                "WHERE status = 'leased' AND lease_expires < ? AND attempts >= max_attempts",
+                (now, now))
+            row = self._conn.execute(
+                "SELECT id, kind, payload, attempts FROM jobs "
+                "WHERE status = 'queued' OR (status = 'leased' AND lease_expires < ?) "
+                "ORDER BY id LIMIT 1", (now,)).fetchone()
+            if row is None:
+                return None
+            job_id, kind, payload, attempts = row
+            self._conn.execute(
+                "UPDATE jobs SET status = 'leased', leased_by = ?, lease_expires = ?, "
+                "attempts = attempts + 1 WHERE id = ?",
+                (worker_id, now + lease_seconds, job_id))
+        return job_id, kind, json.loads(payload), attempts + 1
+
+    def extend(self, job_id, worker_id, lease_seconds):
+        cursor = self._conn.execute(
+            "UPDATE jobs SET lease_expires = ? "
+            "WHERE id = ? AND status = 'leased' AND leased_by = ?",
+            (time.time() + lease_seconds, job_id, worker_id))
+        return cursor.rowcount == 1
+
+    def _finish(self, job_id, worker_id, status, result, error):
+        # Only the current lease holder may write back, so a worker that lost its
+        # lease can't overwrite the result of whoever picked the job up next
+        cursor = self._conn.execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? "
+            "WHERE id = ? AND status = 'leased' AND leased_by = ?",
+            (status, json.dumps(result), error, time.time(), job_id, worker_id))
+        return cursor.rowcount == 1
+
+    def complete(self, job_id, worker_id, result):
+        return self._finish(job_id, worker_id, "done", result, None)
+
+    def fail(self, job_id, worker_id, error):
+        with self._transaction():
+            row = self._conn.execute(
+                "SELECT attempts, max_attempts FROM jobs "
+                "WHERE id = ? AND status = 'leased' AND leased_by = ?",
+                (job_id, worker_id)).fetchone()
+            if row and row[0] < row[1]:
+                # Make it visible again for another attempt
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'queued', leased_by = NULL, lease_expires = NULL, "
+                    "error = ? WHERE id = ? AND status = 'leased' AND leased_by = ?",
+                    (error, job_id, worker_id))
+                return True
+            return self._finish(job_id, worker_id, "failed", None, error)
+
+    def result(self, job_id):
+        row = self._conn.execute(
+            "SELECT status, result, error, leased_by FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        status, result, error, worker = row
+        return {"status": status, "result": json.loads(result) if result else None,
+                "error": error, "worker": worker}
+
+    def stats(self):
+        counts = dict(self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        retried = self._conn.execute("SELECT COUNT(*) FROM jobs WHERE attempts > 1").fetchone()[0]
+        by_worker = dict(self._conn.execute(
+            "SELECT leased_by, COUNT(*) FROM jobs WHERE status = 'done' GROUP BY leased_by").fetchall())
+        return {"counts": counts, "retried": retried, "done_by_worker": by_worker}
+
+    def close(self):
+        self._conn.close()
+
+
+# Job kind -> handler(payload, attempt) returning a JSON-serialisable result (None = failure)
+HANDLERS = {}
+
+
+def register_handler(kind):
+    def decorator(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return decorator
+
+
+@register_handler("mock")
+def mock_handler(payload, attempt):
+    """Mock provider: sleeps like a submit + poll round trip"""
+    if payload.get("crash_on_attempt") == attempt:
+        # Simulate a worker dying mid-job (no cleanup, lease left dangling)
+        os._exit(1)
+    time.sleep(payload.get("duration", 0.2) * random.uniform(0.9, 1.1))
+    return {"status": "Ready", "result": {"sample": f"https://example.invalid/{payload.get('prompt')}.png"}}
+
+
+@register_handler("flux-2-pro")
+def flux2_pro_handler(payload, attempt):
+    from failover import bfl_flux2_pro
+    return bfl_flux2_pro(payload["prompt"], width=payload.get("width", 1024),
+                         height=payload.get("height", 1024), seed=payload.get("seed"))
+
+
+@register_handler("flux-dev")
+def flux_dev_handler(payload, attempt):
+    from failover import cometapi_flux_dev
+    return cometapi_flux_dev(payload["prompt"], width=payload.get("width", 1024),
+                             height=payload.get("height", 1024), seed=payload.get("seed"))
+
+
+_flux_router = None
+
+
+@register_handler("flux")
+def flux_handler(payload, attempt):
+    """Whichever FLUX provider is healthy (see failover.py); one router per process"""
+    global _flux_router
+    if _flux_router is None:
+        from failover import build_flux_router
+        _flux_router = build_flux_router()
+    _provider, result = _flux_router.generate(payload["prompt"], width=payload.get("width", 1024),
+                                              height=payload.get("height", 1024),
+                                              seed=payload.get("seed"))
+    return result
+
+
+def sqlite_broker(path):
+    """Picklable factory for SQLiteBroker, for passing to worker processes"""
+    return functools.partial(SQLiteBroker, path)
+
+
+def load_broker_factory(spec):
+    """Resolve 'module:callable' to a factory returning a Broker"""
+    module_name, _, attr = spec.partition(":")
+    if not attr:
+        raise ValueError(f"Broker factory must look like module:callable, got {spec!r}")
+    return getattr(importlib.import_module(module_name), attr)
+
+
+def _heartbeat(broker_factory, job_id, worker_id, lease_seconds, stop):
+    """Keep extending the lease while the handler runs"""
+    broker = broker_factory()
+    try:
+        while not stop.wait(lease_seconds / 3):
+            if not broker.extend(job_id, worker_id, lease_seconds):
+                print(f"⚠️  Lost lease on job {job_id}")
+                return
+    finally:
+        broker.close()
+
+
+def run_worker(broker_factory, worker_id=None, lease_seconds=60, poll_interval=0.5, idle_exit=None,
+               max_jobs=None, quiet=False):
+    """
+    Pull and run jobs until idle for idle_exit seconds (None = forever); returns jobs run.
+
+    broker_factory is called with no arguments and must return a Broker,
+    e.g. sqlite_broker("jobs.db").
+    """
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{threading.get_ident()}"
+    broker = broker_factory()
+    processed = 0
+    idle_since = time.monotonic()
+
+    try:
+        while max_jobs is None or processed < max_jobs:
+            leased = broker.lease(worker_id, lease_seconds)
+            if leased is None:
+                if idle_exit is not None and time.monotonic() - idle_since >= idle_exit:
+                    break
+                time.sleep(poll_interval)
+                continue
+
+            job_id, kind, payload, attempt = leased
+            if not quiet:
+                print(f"🔧 {worker_id} running job {job_id} ({kind}, attempt {attempt})")
+
+            stop = threading.Event()
+            heartbeat = threading.Thread(target=_heartbeat, daemon=True,
+                                         args=(broker_factory, job_id, worker_id, lease_seconds, stop))
+            heartbeat.start()
+            try:
+                handler = HANDLERS.get(kind)
+                if handler is None:
+                    raise ValueError(f"No handler for job kind: {kind}")
+                result = handler(payload, attempt)
+            except (Exception, SystemExit) as e:
+                # SystemExit too: a script bailing out must fail the job, not kill
+                # the worker and leave the lease to poison the next one
+                print(f"❌ Job {job_id} raised: {e}")
+                result = None
+                error = str(e)
+            else:
+                error = None if result is not None else "handler returned no result"
+            finally:
+                stop.set()
+                heartbeat.join()
+
+            if error is None:
+                broker.complete(job_id, worker_id, result)
+            else:
+                broker.fail(job_id, worker_id, error)
+            processed += 1
+            idle_since = time.monotonic()
+    finally:
+        broker.close()
+
+    return processed
+
+
+def run_worker_threads(broker_factory, threads=1, **options):
+    """
+    Run several polling workers in one process (useful when jobs are mostly
+    waiting on I/O); returns the total number of jobs run
+    """
+    if threads == 1:
+        return run_worker(broker_factory, **options)
+    base_id = options.pop("worker_id", None)
+    counts = [0] * threads
+
+    def run(n):
+        counts[n] = run_worker(broker_factory, **{**options, "worker_id": f"{base_id}-t{n}" if base_id else None})
+
+    workers = [threading.Thread(target=run, args=(n,)) for n in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return sum(counts)
+
+
+def _process_entry(broker_factory, options):
+    run_worker_threads(broker_factory, **options)
+
+
+def run_demo(workers_list=(1, 2, 4, 8), jobs=80, duration=0.1):
+    """Throughput with increasing worker process counts against the mock provider"""
+    print("=" * 70)
+    print("Worker Mode Demo - local processes against a mock provider")
+    print("=" * 70)
+
+    baseline = None
+    for workers in workers_list:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, "queue.db")
+            broker = SQLiteBroker(db_path)
+            broker.enqueue_many([("mock", {"prompt": f"job-{i}", "duration": duration}) for i in range(jobs)])
+
+            start = time.monotonic()
+            processes = [
+                multiprocessing.Process(target=_process_entry, args=(sqlite_broker(db_path), {
+                    "worker_id": f"worker-{n}", "idle_exit": 0.3, "poll_interval": 0.05, "quiet": True}))
+                for n in range(workers)
+            ]
+            for process in processes:
+                process.start()
+            for process in processes:
+                process.join()
+            # Workers wait idle_exit before leaving; don't count that as work time
+            elapsed = time.monotonic() - start - 0.3
+
+            stats = broker.stats()
+            broker.close()
+            throughput = stats["counts"].get("done", 0) / elapsed
+            baseline = baseline or throughput
+            print(f"⚙️  {workers:2} workers: {stats['counts'].get('done', 0)}/{jobs} done, "
+                  f"{throughput:6.1f} jobs/s, speedup {throughput / baseline:4.1f}x")
+
+    # Crash recovery: one worker dies mid-job, its lease expires and another worker finishes it
+    print("\n💥 Crash recovery")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "queue.db")
+        broker = SQLiteBroker(db_path)
+        crash_id = broker.enqueue("mock", {"prompt": "crashy", "duration": duration, "crash_on_attempt": 1})
+        broker.enqueue_many([("mock", {"prompt": f"job-{i}", "duration": duration}) for i in range(10)])
+
+        options = {"lease_seconds": 1.0, "idle_exit": 1.5, "poll_interval": 0.05, "quiet": True}
+        processes = [multiprocessing.Process(target=_process_entry,
+                                             args=(sqlite_broker(db_path),
+                                                   {**options, "worker_id": f"worker-{n}"}))
+                     for n in range(2)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+
+        print(f"🧾 Exit codes: {[process.exitcode for process in processes]}")
+        print(f"🔁 Crashed job: {broker.result(crash_id)['status']} "
+              f"(finished by {broker.result(crash_id)['worker']})")
+        print(f"📊 {broker.stats()}")
+        broker.close()
+
+    print("\n" + "=" * 70)
+    print("✅ Demo completed!")
+    print("=" * 70)
+
+
+def main():
+    """Main execution"""
+    parser = argparse.ArgumentParser(description="Shared-queue worker mode for image generation jobs")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    broker_args = argparse.ArgumentParser(add_help=False)
+    broker_args.add_argument("--db", default="jobs.db", help="SQLite queue file (single host)")
+    broker_args.add_argument("--broker", metavar="MODULE:FACTORY",
+                             help="Use another Broker; the factory is called with no arguments")
+
+    enqueue = sub.add_parser("enqueue", parents=[broker_args], help="Add a job to the queue")
+    enqueue.add_argument("--kind", default="flux", choices=sorted(HANDLERS))
+    enqueue.add_argument("--prompt", required=True)
+    enqueue.add_argument("--width", type=int, default=1024)
+    enqueue.add_argument("--height", type=int, default=1024)
+    enqueue.add_argument("--seed", type=int)
+    enqueue.add_argument("--count", type=int, default=1, help="Enqueue this many copies (seed, seed+1, ...)")
+
+    work = sub.add_parser("work", parents=[broker_args], help="Run worker processes")
+    work.add_argument("--processes", type=int, default=1)
+    work.add_argument("--threads", type=int, default=1, help="Polling workers per process")
+    work.add_argument("--lease", type=float, default=120, help="Visibility timeout in seconds")
+    work.add_argument("--idle-exit", type=float, help="Exit after this many idle seconds")
+
+    status = sub.add_parser("status", parents=[broker_args], help="Show queue counts or a job result")
+    status.add_argument("--job", type=int)
+
+    demo = sub.add_parser("demo", help="Scaling + crash-recovery demo with a mock provider")
+    demo.add_argument("--jobs", type=int, default=80)
+    demo.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+
+    args = parser.parse_args()
+
+    if args.command != "demo":
+        broker_factory = load_broker_factory(args.broker) if args.broker else sqlite_broker(args.db)
+
+    if args.command == "enqueue":
+        broker = broker_factory()
+        for i in range(args.count):
+            seed = args.seed + i if args.seed is not None else None
+            job_id = broker.enqueue(args.kind, {"prompt": args.prompt, "width": args.width,
+                                                "height": args.height, "seed": seed})
+            print(f"✅ Enqueued job {job_id} ({args.kind})")
+        broker.close()
+
+    elif args.command == "work":
+        options = {"threads": args.threads, "lease_seconds": args.lease, "idle_exit": args.idle_exit}
+        processes = [multiprocessing.Process(target=_process_entry, args=(broker_factory, options))
+                     for _ in range(args.processes)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        failed = [process.exitcode for process in processes if process.exitcode != 0]
+        if failed:
+            print(f"❌ {len(failed)} worker process(es) exited abnormally: {failed}")
+            sys.exit(1)
+
+    elif args.command == "status":
+        broker = broker_factory()
+        if args.job is not None:
+            result = broker.result(args.job)
+            if result is None:
+                print(f"❌ No job {args.job}")
+                sys.exit(1)
+            print(json.dumps(result, indent=2))
+        else:
+            print(json.dumps(broker.stats(), indent=2))
+        broker.close()
+
+    elif args.command == "demo":
+        run_demo(workers_list=args.workers, jobs=args.jobs)
+
+
+if __name__ == "__main__":
+    main()